@@ -0,0 +1,68 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+# -----------------------------------------------------------------------------
+# Compiled heat map kernel for py_helios_heatmap.py
+#
+# Optional, py_helios_heatmap.py uses it when numba is not installed and falls
+# back to numpy when this module is not built. Build it in place, next to
+# py_helios_heatmap.py, with OpenMP so rows are colored on all cores:
+#
+#   CFLAGS=-fopenmp LDFLAGS=-fopenmp cythonize -i heatmap_c.pyx
+#
+# Without the OpenMP flags it still builds and runs on a single core. Rows are
+# colored by the kernels in heatmap_simd.h, with AVX2 when the CPU has it.
+# -----------------------------------------------------------------------------
+
+from cython.parallel import prange
+from libc.stdint cimport int16_t, uint8_t, uint32_t
+from libc.stdlib cimport free, malloc
+
+
+cdef extern from "heatmap_simd.h" nogil:
+	int heatmap_cpu_has_avx2()
+	void heatmap_fill_row_scalar(const int16_t *abcy, Py_ssize_t start,
+								 Py_ssize_t width, double scale_z,
+								 const uint32_t *lut32,
+								 Py_ssize_t max_distance, uint8_t *out)
+	void heatmap_fill_row_avx2(const int16_t *abcy, Py_ssize_t width,
+							   double scale_z, const uint32_t *lut32,
+							   Py_ssize_t max_distance, uint8_t *out)
+
+
+cdef int has_avx2 = heatmap_cpu_has_avx2()
+
+
+def fill_rgb(const int16_t[:, :, ::1] array_3d, double scale_z,
+			 const uint8_t[:, ::1] lut, uint8_t[:, :, ::1] out):
+	'''
+	colors the z channel of a (height, width, 4) Coord3D_ABCY16 array into
+		the (height, width, 3) RGB8 out array, using the z (mm) to RGB
+		lookup table of py_helios_heatmap.py. The last entry of the table is
+		used for distances out of its range
+	'''
+	cdef Py_ssize_t height = out.shape[0]
+	cdef Py_ssize_t width = out.shape[1]
+	cdef Py_ssize_t lut_size = lut.shape[0]
+	cdef Py_ssize_t max_distance = lut_size - 2
+	cdef Py_ssize_t i, y
+
+	if height == 0 or width == 0:
+		return
+
+	# pack each RGB entry into one 32 bit word so a color is a single gather
+	cdef uint32_t *lut32 = <uint32_t *>malloc(lut_size * sizeof(uint32_t))
+	if lut32 == NULL:
+		raise MemoryError()
+	for i in range(lut_size):
+		lut32[i] = lut[i, 0] | (<uint32_t>lut[i, 1] << 8) | (
+			<uint32_t>lut[i, 2] << 16)
+
+	try:
+		for y in prange(height, nogil=True):
+			if has_avx2:
+				heatmap_fill_row_avx2(&array_3d[y, 0, 0], width, scale_z,
+									  lut32, max_distance, &out[y, 0, 0])
+			else:
+				heatmap_fill_row_scalar(&array_3d[y, 0, 0], 0, width, scale_z,
+										lut32, max_distance, &out[y, 0, 0])
+	finally:
+		free(lut32)
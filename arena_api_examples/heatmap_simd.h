@@ -0,0 +1,119 @@
+/* ----------------------------------------------------------------------------
+ * Row kernels for heatmap_c.pyx
+ *
+ * Each row of a Coord3D_ABCY16 buffer is colored through a packed lookup
+ * table, lut32[z] = R | G << 8 | B << 16, into RGB8. The AVX2 kernel colors 8
+ * pixels per iteration with two gathers (z values, then colors) and is only
+ * called when the CPU supports it. Both kernels give the same result as the
+ * numpy path of py_helios_heatmap.py.
+ * ------------------------------------------------------------------------- */
+
+#ifndef HEATMAP_SIMD_H
+#define HEATMAP_SIMD_H
+
+#include <stddef.h>
+#include <stdint.h>
+
+#if defined(__GNUC__) && (defined(__x86_64__) || defined(__i386__))
+#include <immintrin.h>
+#define HEATMAP_HAVE_AVX2 1
+#else
+#define HEATMAP_HAVE_AVX2 0
+#endif
+
+static int heatmap_cpu_has_avx2(void)
+{
+#if HEATMAP_HAVE_AVX2
+	__builtin_cpu_init();
+	return __builtin_cpu_supports("avx2");
+#else
+	return 0;
+#endif
+}
+
+static void heatmap_fill_row_scalar(const int16_t *abcy, ptrdiff_t start,
+									ptrdiff_t width, double scale_z,
+									const uint32_t *lut32,
+									ptrdiff_t max_distance, uint8_t *out)
+{
+	ptrdiff_t x, z;
+	uint32_t rgb;
+
+	for (x = start; x < width; x++) {
+		/* the cast truncates toward zero like int() in python */
+		z = (ptrdiff_t)(abcy[x * 4 + 2] * scale_z);
+		if (z < 0 || z > max_distance)
+			z = max_distance + 1;
+		rgb = lut32[z];
+		out[x * 3] = (uint8_t)rgb;
+		out[x * 3 + 1] = (uint8_t)(rgb >> 8);
+		out[x * 3 + 2] = (uint8_t)(rgb >> 16);
+	}
+}
+
+#if HEATMAP_HAVE_AVX2
+
+__attribute__((target("avx2")))
+static void heatmap_fill_row_avx2(const int16_t *abcy, ptrdiff_t width,
+								  double scale_z, const uint32_t *lut32,
+								  ptrdiff_t max_distance, uint8_t *out)
+{
+	/* byte offset of the z channel of 8 consecutive ABCY16 pixels */
+	const __m256i z_offsets = _mm256_setr_epi32(0, 8, 16, 24, 32, 40, 48, 56);
+	const __m256d scale = _mm256_set1_pd(scale_z);
+	const __m256i zero = _mm256_setzero_si256();
+	const __m256i max_z = _mm256_set1_epi32((int)max_distance);
+	const __m256i out_of_range_index = _mm256_set1_epi32((int)max_distance + 1);
+	/* drops the 4th byte of each packed color: 4 RGB pixels in 12 bytes
+	 * per 128 bit lane */
+	const __m256i pack_rgb = _mm256_setr_epi8(
+		0, 1, 2, 4, 5, 6, 8, 9, 10, 12, 13, 14, -1, -1, -1, -1,
+		0, 1, 2, 4, 5, 6, 8, 9, 10, 12, 13, 14, -1, -1, -1, -1);
+	__m256i z, out_of_range, rgb;
+	__m256d z_low, z_high;
+	ptrdiff_t x = 0;
+
+	/* each iteration writes 28 bytes (24 valid + 4 overwritten by the next
+	 * iteration), so stop while 10 pixels are left to stay inside the row */
+	for (; x + 10 <= width; x += 8) {
+		/* 32 bits are read per pixel, z and intensity. Shifting left then
+		 * right keeps z with its sign */
+		z = _mm256_i32gather_epi32((const int *)(abcy + x * 4 + 2),
+								   z_offsets, 1);
+		z = _mm256_srai_epi32(_mm256_slli_epi32(z, 16), 16);
+
+		/* convert to mm in double precision, truncating like int() */
+		z_low = _mm256_mul_pd(
+			_mm256_cvtepi32_pd(_mm256_castsi256_si128(z)), scale);
+		z_high = _mm256_mul_pd(
+			_mm256_cvtepi32_pd(_mm256_extracti128_si256(z, 1)), scale);
+		z = _mm256_set_m128i(_mm256_cvttpd_epi32(z_high),
+							 _mm256_cvttpd_epi32(z_low));
+
+		out_of_range = _mm256_or_si256(_mm256_cmpgt_epi32(zero, z),
+									   _mm256_cmpgt_epi32(z, max_z));
+		z = _mm256_blendv_epi8(z, out_of_range_index, out_of_range);
+
+		rgb = _mm256_i32gather_epi32((const int *)lut32, z, 4);
+		rgb = _mm256_shuffle_epi8(rgb, pack_rgb);
+		_mm_storeu_si128((__m128i *)(out + x * 3),
+						 _mm256_castsi256_si128(rgb));
+		_mm_storeu_si128((__m128i *)(out + x * 3 + 12),
+						 _mm256_extracti128_si256(rgb, 1));
+	}
+
+	heatmap_fill_row_scalar(abcy, x, width, scale_z, lut32, max_distance, out);
+}
+
+#else
+
+static void heatmap_fill_row_avx2(const int16_t *abcy, ptrdiff_t width,
+								  double scale_z, const uint32_t *lut32,
+								  ptrdiff_t max_distance, uint8_t *out)
+{
+	heatmap_fill_row_scalar(abcy, 0, width, scale_z, lut32, max_distance, out);
+}
+
+#endif
+
+#endif /* HEATMAP_SIMD_H */
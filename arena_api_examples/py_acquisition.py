@@ -43,10 +43,7 @@ def create_devices_with_tries():
 			print(
 				f'{TAB1}Try {tries+1} of {tries_max}: waiting for {sleep_time_secs} '
 				f'secs for a device to be connected!')
-			for sec_count in range(sleep_time_secs):
-				time.sleep(1)
-				print(f'{TAB1}{sec_count + 1 } seconds passed ',
-					'.' * sec_count, end='\r')
+			time.sleep(sleep_time_secs)
 			tries += 1
 		else:
 			print(f'{TAB1}Created {len(devices)} device(s)')
@@ -60,16 +57,25 @@ def configure_and_get_image_buffers(device):
 
 	nodemap = device.nodemap
 	tl_stream_nodemap = device.tl_stream_nodemap
-	nodes = device.nodemap.get_node(['Width', 'Height'])
+
+	'''
+	Get all the nodes used by the example at once
+		Nodemap.get_node() takes a list of node names and returns a dict of
+		nodes, looking them all up in one call instead of one call per node.
+		The returned nodes are reused for every read and write below.
+	'''
+	nodes = nodemap.get_node(['AcquisitionMode', 'Width', 'Height'])
+	tl_stream_nodes = tl_stream_nodemap.get_node(['StreamBufferHandlingMode',
+		'StreamAutoNegotiatePacketSize', 'StreamPacketResendEnable'])
 
 	# Store initial settings, to restore later
 	width_initial = nodes['Width'].value
 	height_initial = nodes['Height'].value
 
 	# Set features before streaming.-------------------------------------------
-	initial_acquisition_mode = nodemap.get_node("AcquisitionMode").value
+	initial_acquisition_mode = nodes['AcquisitionMode'].value
 
-	nodemap.get_node("AcquisitionMode").value = "Continuous"
+	nodes['AcquisitionMode'].value = "Continuous"
 	'''
 	Set buffer handling mode.
 		Set buffer handling mode before starting the stream. Starting the stream
@@ -79,7 +85,7 @@ def configure_and_get_image_buffers(device):
 		'NewestOnly' ensures the most recent image is delivered, even if it means
 		skipping frames.
 	'''
-	tl_stream_nodemap["StreamBufferHandlingMode"].value = "NewestOnly"
+	tl_stream_nodes["StreamBufferHandlingMode"].value = "NewestOnly"
 
 	'''
 	Enable stream auto negotiate packet size
@@ -90,7 +96,7 @@ def configure_and_get_image_buffers(device):
 		image, thereby reducing CPU load on the host system. Ethernet settings
 		may also be manually changed to allow for a larger packet size.
 	'''
-	tl_stream_nodemap['StreamAutoNegotiatePacketSize'].value = True
+	tl_stream_nodes['StreamAutoNegotiatePacketSize'].value = True
 
 	'''
 	Enable stream packet resend
@@ -101,7 +107,7 @@ def configure_and_get_image_buffers(device):
 		and this information is used to retrieve and redeliver the missing packet
 		in the correct order.
 	'''
-	tl_stream_nodemap['StreamPacketResendEnable'].value = True
+	tl_stream_nodes['StreamPacketResendEnable'].value = True
 
 	# Set width and height to their max values
 	print(f'{TAB1}Setting \'Width\' and \'Height\' Nodes value to their '
@@ -123,29 +129,31 @@ def configure_and_get_image_buffers(device):
 	Device.get_buffer() returns buffers:
 		Device.get_buffer() with no arguments returns one buffer(NOT IN A LIST)
 		Device.get_buffer(20) returns 20 buffers(IN A LIST)
-	'''
-	print(f'{TAB1}Get {number_of_buffers} buffers in a list')
-	buffers = device.get_buffer(number_of_buffers)
-
-	'''
-	Print image buffer info
-		Buffers contain image data. Image data can also be copied and converted
-		using BufferFactory. That is necessary to retain image data, as we must
-		also requeue the buffer.
-	'''
-	for count, buffer in enumerate(buffers):
+	Buffers are fetched and requeued one at a time, so only one buffer is
+		held away from the stream at any moment instead of all of them.
+	'''
+	print(f'{TAB1}Get {number_of_buffers} buffers')
+	for count in range(number_of_buffers):
+		buffer = device.get_buffer()
+
+		'''
+		Print image buffer info
+			Buffers contain image data. Image data can also be copied and
+			converted using BufferFactory. That is necessary to retain image
+			data, as we must also requeue the buffer.
+		'''
 		print(f'{TAB2}buffer{count:{2}} received | '
 			f'Width = {buffer.width} pxl, '
 			f'Height = {buffer.height} pxl, '
 			f'Pixel Format = {buffer.pixel_format.name}')
 
-	
-	'''
-	'Device.requeue_buffer()' takes a buffer or many buffers in a list or tuple.
-	returns them to the queue. Failure to requeue can lead to memory leaks or
-	running out of buffers.
-	'''
-	device.requeue_buffer(buffers)
+		'''
+		'Device.requeue_buffer()' takes a buffer or many buffers in a list or
+		tuple. returns them to the queue. Failure to requeue can lead to
+		memory leaks or running out of buffers.
+		'''
+		device.requeue_buffer(buffer)
+
 	print(f'{TAB1}Requeued {number_of_buffers} buffers')
 
 	'''
@@ -155,9 +163,9 @@ def configure_and_get_image_buffers(device):
 	print(f'{TAB1}Stream stopped')
 
 	# Restore initial values
-	nodemap.get_node("AcquisitionMode").value = initial_acquisition_mode
-	nodemap.get_node("Width").value = width_initial
-	nodemap.get_node("Height").value = height_initial
+	nodes['AcquisitionMode'].value = initial_acquisition_mode
+	nodes['Width'].value = width_initial
+	nodes['Height'].value = height_initial
 
 
 def example_entry_point():
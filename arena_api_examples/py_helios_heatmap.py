@@ -14,12 +14,33 @@
 import ctypes
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 from arena_api.__future__.save import Writer
 from arena_api.buffer import BufferFactory
 from arena_api.enums import PixelFormat
 from arena_api.system import system
 
+try:
+	from numba import njit, prange
+except ImportError:
+	# numba is optional, the numpy lookup table path is used without it
+	njit = None
+
+try:
+	# optional compiled kernel, used when numba is not installed. See
+	# heatmap_c.pyx for how to build it
+	import heatmap_c
+except ImportError:
+	heatmap_c = None
+
+try:
+	# optional, used only when the example is run with --gpu
+	import cupy as cp
+except ImportError:
+	cp = None
+
 '''
 Helios Heat Map: Introduction
     This example demonstrates the transformation of 3-dimensional data to produce
@@ -39,6 +60,9 @@ COLOR_BORDER_BLUE = 1500
 TAB1 = "  "
 TAB2 = "    "
 
+# bits per pixel of the BGR8 jpg heat map, looked up once
+BGR8_BITS_PER_PIXEL = PixelFormat.get_bits_per_pixel(PixelFormat.BGR8)
+
 # check if Helios2 camera used for the example
 isHelios2 = False
 
@@ -58,10 +82,7 @@ def create_devices_with_tries():
 			print(
 				f'{TAB1}Try {tries+1} of {tries_max}: waiting for {sleep_time_secs} '
 				f'secs for a device to be connected!')
-			for sec_count in range(sleep_time_secs):
-				time.sleep(1)
-				print(f'{TAB1}{sec_count + 1 } seconds passed ',
-					'.' * sec_count, end='\r')
+			time.sleep(sleep_time_secs)
 			tries += 1
 		else:
 			print(f'{TAB1}Created {len(devices)} device(s)')
@@ -93,11 +114,12 @@ def validate_device(device):
 			  f'Please update Helios firmware.\n')
 		sys.exit()
 
-	# check if Helios2 camera used for the example
+	# check if Helios2 camera used for the example. Each model name is tested
+	# on its own, a bare 'HLT' or ... would always be true
+	global isHelios2
 	device_model_name_node = device.nodemap['DeviceModelName'].value
-	if 'HLT' or 'HTP' in device_model_name_node:
-		global isHelios2
-		isHelios2 = True
+	isHelios2 = ('HLT' in device_model_name_node or
+				 'HTP' in device_model_name_node)
 
 
 def get_rgb_colors_of_point_at_distance(z):
@@ -137,9 +159,7 @@ def get_rgb_colors_of_point_at_distance(z):
 	return int(red), int(green), int(blue)
 
 
-def get_a_BGR8_distance_heatmap_ctype_array(buffer_3d, scale_z):
-
-	# 3D buffer info -------------------------------------------------
+def get_3d_array(buffer_3d):
 
 	# "Coord3D_ABCY16s" and "Coord3D_ABCY16" pixelformats have 4
 	# channels pre pixel. Each channel is 16 bits and they represent:
@@ -149,155 +169,244 @@ def get_a_BGR8_distance_heatmap_ctype_array(buffer_3d, scale_z):
 	#   - intensity
 	# the value can be dynamically calculated this way:
 	#   int(buffer_3d.bits_per_pixel/16) # 16 is the size of each channel
-	Coord3D_ABCY16_channels_per_pixel = buffer_3d_step_size = 4
+	Coord3D_ABCY16_channels_per_pixel = 4
+
+	Coord3D_ABCY16_channel_size_bytes = 2
+	array_3d_size_in_bytes = (buffer_3d.width * buffer_3d.height *
+							  Coord3D_ABCY16_channels_per_pixel *
+							  Coord3D_ABCY16_channel_size_bytes)
 
-	# Buffer.pdata is a (uint8, ctypes.c_ubyte) pointer. "Coord3D_ABCY16"
-	# pixelformat has 4 channels, and each channel is 16 bits.
-	# It is easier to deal with Buffer.pdata if it is cast to 16bits
-	# so each channel value is read/accessed easily.
+	# Buffer.pdata is a (uint8, ctypes.c_ubyte) pointer. A ctypes byte array
+	# is placed at its address and numpy views that memory as 16 bit
+	# channels, so the whole buffer is exposed by one call and no data is
+	# copied.
 	# "Coord3D_ABCY16" might be suffixed with "s" to indicate that the data
 	# should be interpereted as signed.
-	pdata_16bit = ctypes.cast(buffer_3d.pdata, ctypes.POINTER(ctypes.c_int16))
+	pdata_address = ctypes.addressof(buffer_3d.pdata.contents)
+	pdata_bytes = (ctypes.c_ubyte * array_3d_size_in_bytes).from_address(
+		pdata_address)
+	array_3d = np.frombuffer(pdata_bytes, dtype=np.int16)
+
+	# (height, width, channels)
+	return array_3d.reshape((buffer_3d.height, buffer_3d.width,
+							 Coord3D_ABCY16_channels_per_pixel))
+
+
+def get_z_in_mm_array(buffer_3d, scale_z):
+
+	# Isolate the z channel.
+	# In one pixel:
+	#   The first channel is the x coordinate,
+	#   the second channel is the y coordinate,
+	#   the third channel is the z coordinate, and
+	#   the fourth channel is intensity.
+	# The z coordinate is what used to determine the coloring
+	z = get_3d_array(buffer_3d)[..., 2]
+
+	# Convert z to millimeters
+	#   The z data converts at a specified ratio to mm, so by
+	#   multiplying it by the Scan3dCoordinateScale for CoordinateC, we
+	#   can convert it to millimeters and can then compare it to the
+	#   maximum distance of 1500mm.
+	return (z * scale_z).astype(np.int32)
+
+
+# z (mm) to RGB lookup table --------------------------------------------------
+# z is an integer in millimeters, and only 0 to COLOR_BORDER_BLUE mm are
+# colored, so every possible color is computed once at import. The extra last
+# entry is black and is used for any distance out of that range.
+Z_TO_RGB_LUT = np.array(
+	[get_rgb_colors_of_point_at_distance(z)
+	 for z in range(COLOR_BORDER_RED, COLOR_BORDER_BLUE + 1)] +
+	[(RGB_MIN, RGB_MIN, RGB_MIN)],
+	dtype=np.uint8)
+
+
+if njit is not None:
+
+	@njit(parallel=True, fastmath=True, boundscheck=False, cache=True)
+	def _fill_rgb(array_3d, scale_z, lut, out):
+
+		# compiled version of the lookup in _build_rgb(). Rows are colored in
+		# parallel and written straight into out, so no temporary arrays are
+		# made
+		height, width = out.shape[0], out.shape[1]
+		out_of_range_index = lut.shape[0] - 1
+		for y in prange(height):
+			for x in range(width):
+				z = int(array_3d[y, x, 2] * scale_z)
+				if z < COLOR_BORDER_RED or z > COLOR_BORDER_BLUE:
+					z = out_of_range_index
+				out[y, x, 0] = lut[z, 0]
+				out[y, x, 1] = lut[z, 1]
+				out[y, x, 2] = lut[z, 2]
+
+	# compile once at import so the first frame does not pay for it
+	_fill_rgb(np.zeros((1, 1, 4), dtype=np.int16), 1.0, Z_TO_RGB_LUT,
+			  np.empty((1, 1, 3), dtype=np.uint8))
+
+
+# copy of Z_TO_RGB_LUT on the gpu, uploaded on the first gpu frame
+_Z_TO_RGB_LUT_GPU = None
+
+
+def _build_rgb_gpu(buffer_3d, scale_z, out):
+
+	# same lookup as the numpy path of _build_rgb() done on the gpu. Only the
+	# z channel is uploaded and only the colored frame is downloaded, which
+	# pays off for large frames or when the gpu would otherwise be idle
+	global _Z_TO_RGB_LUT_GPU
+	if _Z_TO_RGB_LUT_GPU is None:
+		_Z_TO_RGB_LUT_GPU = cp.asarray(Z_TO_RGB_LUT)
+
+	z_gpu = cp.asarray(np.ascontiguousarray(get_3d_array(buffer_3d)[..., 2]))
+	z_gpu = (z_gpu * scale_z).astype(cp.int32)
+	out_of_range = (z_gpu < COLOR_BORDER_RED) | (z_gpu > COLOR_BORDER_BLUE)
+	lut_index = cp.where(out_of_range, COLOR_BORDER_BLUE + 1, z_gpu)
+	_Z_TO_RGB_LUT_GPU[lut_index].get(out=out)
+	return out
+
+
+def _build_rgb(buffer_3d, scale_z, out=None, use_gpu=False):
+
+	# decode the z channel and color it once. Both the jpg (BGR) and the ply
+	# (RGB) outputs are produced from this single (height, width, 3) array.
+	# When out is given it is rewritten in place instead of allocating
+	if out is None:
+		out = np.empty((buffer_3d.height, buffer_3d.width, 3), dtype=np.uint8)
+
+	if use_gpu:
+		return _build_rgb_gpu(buffer_3d, scale_z, out)
+
+	if njit is not None:
+		_fill_rgb(get_3d_array(buffer_3d), scale_z, Z_TO_RGB_LUT, out)
+		return out
+
+	if heatmap_c is not None:
+		heatmap_c.fill_rgb(get_3d_array(buffer_3d), scale_z, Z_TO_RGB_LUT, out)
+		return out
 
-	number_of_pixels = buffer_3d.width * buffer_3d.height
-
-	# out array info -------------------------------------------------
+	# vectorized version of get_rgb_colors_of_point_at_distance(). Clipping
+	# to [-1, COLOR_BORDER_BLUE + 1] sends every out of range distance to
+	# the last, black, entry of the table (-1 wraps to the end), then a
+	# single gather colors all pixels in RGB order
+	z = get_z_in_mm_array(buffer_3d, scale_z)
+	lut_index = np.clip(z, -1, COLOR_BORDER_BLUE + 1)
+	return Z_TO_RGB_LUT.take(lut_index, axis=0, out=out, mode='wrap')
+
+
+class HeatmapRenderer:
+	'''
+	Owns the BGR8 (jpg) and RGB8 (ply) heat map arrays of one frame size and
+		rewrites them in place on every render() call, so no output memory is
+		allocated per frame. The pointers stay valid for the renderer's
+		lifetime but their content is overwritten by the next render(), so it
+		must be saved/copied before rendering another frame.
+	The jpg and ply writers are also kept here so every frame is saved by the
+		same Writer objects instead of creating new ones per frame, and so is
+		the BufferFactory buffer the jpg is saved from, see get_heat_buffer()
+	'''
 
-	BGR8_channels_per_pixel = array_bgr8_step_size = 3  # Blue, Green, Red
-	BGR8_channel_size_bits = 8
-	BGR8_pixel_size_bytes = BGR8_channel_size_bits * BGR8_channels_per_pixel
-	array_BGR8_size_in_bytes = BGR8_pixel_size_bytes * number_of_pixels
+	def __init__(self, width, height, use_gpu=False):
+		self.width = width
+		self.height = height
+		self.use_gpu = use_gpu
 
-	# array to return
-	# c_byte and not c_ubyte because it is signed data
-	CustomArrayType = (ctypes.c_byte * array_BGR8_size_in_bytes)
-	array_BGR8_for_jpg = CustomArrayType()
+		self._array_RGB8 = np.empty((height, width, 3), dtype=np.uint8)
+		self._array_BGR8 = np.empty((height, width, 3), dtype=np.uint8)
 
-	# iterate --------------------------------------------------------
+		uint8_ptr = ctypes.POINTER(ctypes.c_ubyte)
+		self.ptr_array_RGB8 = self._array_RGB8.ctypes.data_as(uint8_ptr)
+		self.ptr_array_BGR8 = self._array_BGR8.ctypes.data_as(uint8_ptr)
+		self.array_BGR8_size_in_bytes = int(width * height *
+											BGR8_BITS_PER_PIXEL / 8)
+
+		# the jpg writer takes its settings from the first heat buffer, see
+		# example_entry_point()
+		self.writer_jpg = None
+		self.writer_ply = Writer()
+
+		# created by the first get_heat_buffer() call
+		self._heat_buffer = None
+
+	def render(self, buffer_3d, scale_z, bgr=True):
+		# bgr=False skips filling the BGR8 array when no jpg is written
+		_build_rgb(buffer_3d, scale_z, out=self._array_RGB8,
+				   use_gpu=self.use_gpu)
+		if bgr:
+			np.copyto(self._array_BGR8, self._array_RGB8[..., ::-1])
+
+	def get_heat_buffer(self):
+		'''
+		returns the BGR8 heat map as a BufferFactory buffer, which is what
+			Writer.save() takes. The buffer is created on the first call only,
+			later calls copy the newly rendered BGR8 array into the same
+			buffer instead of creating and destroying one per frame. It is
+			destroyed by destroy_heat_buffer()
+		'''
+		if self._heat_buffer is None:
+			self._heat_buffer = BufferFactory.create(
+				self.ptr_array_BGR8,
+				self.array_BGR8_size_in_bytes,
+				self.width,
+				self.height,
+				PixelFormat.BGR8)
+		else:
+			ctypes.memmove(self._heat_buffer.pdata, self.ptr_array_BGR8,
+						   self.array_BGR8_size_in_bytes)
+		return self._heat_buffer
 
-	# iterate over two arrays with different internals
-	# buffer_3d  : [x][y][z][a] | [x][y][z][a] | ... (each [] is 16 bit)
-	# buffer_rgp : [b][g][r]    | [b][g][r]    | ... (each [] is 8 bit)
-	buffer_3d_pixel_index = 0
-	array_bgr8_pixel_index = 0
-	for _ in range(number_of_pixels):
-
-		# Isolate the z channel.
-		# In one pixel:
-		#   The first channel is the x coordinate,
-		#   the second channel is the y coordinate,
-		#   the third channel is the z coordinate, and
-		#   the fourth channel is intensity.
-		# The z coordinate is what used to determine the coloring
-		z = pdata_16bit[buffer_3d_pixel_index + 2]
-
-		# Convert z to millimeters
-		#   The z data converts at a specified ratio to mm, so by
-		#   multiplying it by the Scan3dCoordinateScale for CoordinateC, we
-		#   can convert it to millimeters and can then compare it to the
-		#   maximum distance of 1500mm.
-		z = int(z * scale_z)
-
-		# color respons to the z distance
-		red, green, blue = get_rgb_colors_of_point_at_distance(z)
-
-		# fill into the current pixel in BGR order not RGB
-		array_BGR8_for_jpg[array_bgr8_pixel_index] = blue
-		array_BGR8_for_jpg[array_bgr8_pixel_index + 1] = green
-		array_BGR8_for_jpg[array_bgr8_pixel_index + 2] = red
-
-		# next pixel index corresping index
-		buffer_3d_pixel_index += buffer_3d_step_size
-		array_bgr8_pixel_index += array_bgr8_step_size
-
-	return array_BGR8_for_jpg
+	def destroy_heat_buffer(self):
+		# buffers created with BufferFactory must be destroyed
+		if self._heat_buffer is not None:
+			BufferFactory.destroy(self._heat_buffer)
+			self._heat_buffer = None
 
 
-def get_a_RGB_colring_ctype_array(buffer_3d, scale_z):
+def _as_ctype_array(array_8bit):
 
-	# 3D buffer info -------------------------------------------------
+	# colors are 0 to 255 so the array is c_ubyte, which matches the
+	# POINTER(c_ubyte) the writers take. from_buffer() wraps the numpy memory
+	# without allocating or zero filling a new ctypes array, the ctypes array
+	# shares memory with array_8bit and keeps it alive
+	array_8bit = np.ascontiguousarray(array_8bit, dtype=np.uint8)
+	CustomArrayType = (ctypes.c_ubyte * array_8bit.nbytes)
+	return CustomArrayType.from_buffer(array_8bit)
 
-	# "Coord3D_ABCY16s" and "Coord3D_ABCY16" pixelformats have 4
-	# channels pre pixel. Each channel is 16 bits and they represent:
-	#   - x position
-	#   - y postion
-	#   - z postion
-	#   - intensity
-	# the value can be dinamically calculated this way:
-	#   int(buffer_3d.bits_per_pixel/16) # 16 is the size of each channel
-	Coord3D_ABCY16_channels_per_pixel = buffer_3d_step_size = 4
 
-	# Buffer.pdata is a (uint8, ctypes.c_ubyte) pointer. "Coord3D_ABCY16"
-	# pixelformat has 4 channels, and each channel is 16 bits.
-	# It is easier to deal with Buffer.pdata if it is cast to 16bits
-	# so each channel value is read/accessed easily.
-	# "Coord3D_ABCY16" might be suffixed with "s" to indicate that the data
-	# should be interpereted as signed.
-	pdata_16bit = ctypes.cast(buffer_3d.pdata, ctypes.POINTER(ctypes.c_int16))
+def get_a_BGR8_distance_heatmap_ctype_array(buffer_3d, scale_z):
 
-	number_of_pixels = buffer_3d.width * buffer_3d.height
+	# color respons to the z distance, in BGR order not RGB
+	# buffer_3d  : [x][y][z][a] | [x][y][z][a] | ... (each [] is 16 bit)
+	# array_bgr8 : [b][g][r]    | [b][g][r]    | ... (each [] is 8 bit)
+	return _as_ctype_array(_build_rgb(buffer_3d, scale_z)[..., ::-1])
 
-	# out array info -------------------------------------------------
 
-	RGB8_channels_per_pixel = array_rgb8_step_size = 3  # RED, Green, Blue
-	RGB8_channel_size_bits = 8
-	RGB8_pixel_size_bytes = RGB8_channel_size_bits * RGB8_channels_per_pixel
-	array_RGB8_size_in_bytes = RGB8_pixel_size_bytes * number_of_pixels
+def get_a_RGB_colring_ctype_array(buffer_3d, scale_z):
 
-	# array to return
-	# c_byte and not c_ubyte because it is signed data
-	CustomArrayType = (ctypes.c_byte * array_RGB8_size_in_bytes)
-	array_RGB8_for_ply_coloring = CustomArrayType()
+	# color respons to the z distance, in RGB order not BGR
+	# buffer_3d  : [x][y][z][a] | [x][y][z][a] | ... (each [] is 16 bit)
+	# array_rgb8 : [r][g][b]    | [r][g][b]    | ... (each [] is 8 bit)
+	return _as_ctype_array(_build_rgb(buffer_3d, scale_z))
 
-	# iterate --------------------------------------------------------
 
-	# iterate over two arrays with different internals
-	# buffer_3d  : [x][y][z][a] | [x][y][z][a] | ... (each [] is 16 bit)
-	# buffer_rgp : [r][g][b]    | [r][g][b]    | ... (each [] is 8 bit)
-	buffer_3d_pixel_index = 0
-	array_rgb8_pixel_index = 0
-	for _ in range(number_of_pixels):
-
-		# Isolate the z channel.
-		# In one pixel:
-		#   The first channel is the x coordinate,
-		#   the second channel is the y coordinate,
-		#   the third channel is the z coordinate, and
-		#   the fourth channel is intensity.
-		# The z coordinate is what used to determine the coloring
-		z = pdata_16bit[buffer_3d_pixel_index + 2]
-
-		# Convert z to millimeters
-		#   The z data converts at a specified ratio to mm, so by
-		#   multiplying it by the Scan3dCoordinateScale for CoordinateC,  we
-		#   are able to convert it to millimeters and can then compare it to the
-		#   maximum distance of 1500mm.
-		z = int(z * scale_z)
-
-		# color respons to the z distance
-		red, green, blue = get_rgb_colors_of_point_at_distance(z)
-
-		# fill into the current pixel in RGB order not BGR
-		array_RGB8_for_ply_coloring[array_rgb8_pixel_index] = red
-		array_RGB8_for_ply_coloring[array_rgb8_pixel_index + 1] = green
-		array_RGB8_for_ply_coloring[array_rgb8_pixel_index + 2] = blue
-
-		# next pixel index corresping index
-		buffer_3d_pixel_index += buffer_3d_step_size
-		array_rgb8_pixel_index += array_rgb8_step_size
-
-	return array_RGB8_for_ply_coloring
-
-
-def example_entry_point():
+def example_entry_point(*, use_gpu=False, write_jpg=True, write_ply=True):
 	#
 	# This example demonstrates saving an RGB heatmap of a 3D image. It
 	# captures a 3D image, interprets the ABCY data to retrieve the
 	# distance value for each pixel and then converts this data into a BGR
 	# and an RGB buffer. The BGR buffer is used to create a jpg heatmap
 	# image and the RGB buffer is used to color the ply image.
+	# With use_gpu the heat map is colored on the gpu with cupy.
+	# write_jpg and write_ply select the files to save, work for a file
+	# that is not written is skipped.
 	#
 
+	if use_gpu and cp is None:
+		print(f'{TAB1}cupy is not installed, coloring the heat map on the '
+			  f'cpu')
+		use_gpu = False
+
 	# Create a device
 	devices = create_devices_with_tries()
 	device = system.select_device(devices)
@@ -307,6 +416,11 @@ def example_entry_point():
 	# Get device stream nodemap
 	tl_stream_nodemap = device.tl_stream_nodemap
 
+	# Set buffer handling mode to 'NewestOnly' so the single buffer grabbed
+	# below is the most recent image and not a stale frame left queued by
+	# the stream engine
+	tl_stream_nodemap['StreamBufferHandlingMode'].value = 'NewestOnly'
+
 	# Enable stream auto negotiate packet size
 	tl_stream_nodemap['StreamAutoNegotiatePacketSize'].value = True
 
@@ -343,6 +457,9 @@ def example_entry_point():
 
 	# Grab buffers ------------------------------------------------------------
 
+	# two threads, one per output file
+	save_executor = ThreadPoolExecutor(max_workers=2)
+
 	# Starting the stream allocates buffers and begins filling them with data.
 	with device.start_stream(1):
 
@@ -353,68 +470,73 @@ def example_entry_point():
 		buffer_3d = device.get_buffer()
 		print(f'{TAB1}buffer received')
 
-		# JPG FILE (2D heat map) -------------------------------------
+		# the z channel is decoded and colored once, the BGR array for the
+		# jpg and the RGB array for the ply are both rendered from it into
+		# arrays owned by the renderer. The BGR array is only filled when the
+		# jpg is written
+		print(f'{TAB2}Creating heat map from buffer')
+		renderer = HeatmapRenderer(buffer_3d.width, buffer_3d.height,
+								   use_gpu=use_gpu)
+		renderer.render(buffer_3d, scale_z, bgr=write_jpg)
 
-		print(f'{TAB2}Creating BGR8 array from buffer')
-		array_BGR8_for_jpg = get_a_BGR8_distance_heatmap_ctype_array(buffer_3d,
-																	scale_z)
-		uint8_ptr = ctypes.POINTER(ctypes.c_ubyte)
-		ptr_array_BGR8_for_jpg = uint8_ptr(array_BGR8_for_jpg)
-		bits_per_pixel =  PixelFormat.get_bits_per_pixel(PixelFormat.BGR8)
-		array_BGR8_for_jpg_size_in_bytes = int(buffer_3d.width * buffer_3d.height * bits_per_pixel / 8)
-
-		heat_buffer = BufferFactory.create(ptr_array_BGR8_for_jpg,
-										array_BGR8_for_jpg_size_in_bytes,
-										buffer_3d.width,
-										buffer_3d.height,
-										PixelFormat.BGR8)
-
-		# create an image writer
-		# The writer, optionally, can take width, height, and bits per pixel
-		# of the image(s) it would save. if these arguments are not passed
-		# at run time, the first buffer passed to the Writer.save()
-		# function will configure the writer to the arguments buffer's width,
-		# height, and bits per pixel
-
-		# takes the setting of writer from buffer
-		writer_jpg = Writer.from_buffer(heat_buffer)
-		# save function takes a buffer made with BufferFactory that's why
-		# heat_buffer was created though BufferFactory in the previous
-		# steps
-		writer_jpg.save(heat_buffer, 'heatmap.jpg')
+		# The jpg and the ply are written on the save_executor threads at
+		# the same time instead of one after the other
+		save_futures = []
 
-		# buffers created with BufferFactory must be destroyed
-		BufferFactory.destroy(heat_buffer)
+		# JPG FILE (2D heat map) -------------------------------------
 
-		# PLY FILE (3D heat map)--------------------------------------
+		if write_jpg:
+			heat_buffer = renderer.get_heat_buffer()
+
+			# create an image writer
+			# The writer, optionally, can take width, height, and bits per
+			# pixel of the image(s) it would save. if these arguments are not
+			# passed at run time, the first buffer passed to the
+			# Writer.save() function will configure the writer to the
+			# arguments buffer's width, height, and bits per pixel
+
+			# takes the setting of writer from buffer. It is created once and
+			# reused for every following frame of the same renderer
+			if renderer.writer_jpg is None:
+				renderer.writer_jpg = Writer.from_buffer(heat_buffer)
+			# save function takes a buffer made with BufferFactory that's why
+			# heat_buffer was created though BufferFactory in the previous
+			# steps
+			jpg_future = save_executor.submit(renderer.writer_jpg.save,
+											  heat_buffer, 'heatmap.jpg')
+			save_futures.append(jpg_future)
 
-		print(f'{TAB2}Creating RGB8 array from buffer')
-		array_RGB_colors = get_a_RGB_colring_ctype_array(buffer_3d, scale_z)
+		# PLY FILE (3D heat map)--------------------------------------
 
-		uint8_ptr = ctypes.POINTER(ctypes.c_ubyte)
-		ptr_array_RGB_colors = uint8_ptr(array_RGB_colors)
-
-		writer_ply = Writer()
-		# save function
-		# buffer :
-		#   buffer to save.
-		# pattern :
-		#   default name for the image is 'image_<count>.jpg' where count
-		#   is a pre-defined tag that gets updated every time a buffer image
-		#   is saved. More custom tags can be added using
-		#   Writer.register_tag() function
-		# kwargs (optional args) ignored if not an .ply image:
-		#   - 'filter_points' default is True.
-		#       Filters NaN points (A = B = C = -32,678)
-		#   - 'is_signed' default is False.
-		#       If pixel format is signed for example PixelFormat.Coord3D_A16s
-		#       then this arg must be passed to the save function else
-		#       the results would not be correct
-		#   - 'scale' default is 0.25.
-		#   - 'offset_a', 'offset_b' and 'offset_c' default to 0.0
-		writer_ply.save(buffer_3d, 'heatmap.ply',
-						color=ptr_array_RGB_colors,
-						filter_points=True)
+		if write_ply:
+			# save function
+			# buffer :
+			#   buffer to save.
+			# pattern :
+			#   default name for the image is 'image_<count>.jpg' where count
+			#   is a pre-defined tag that gets updated every time a buffer
+			#   image is saved. More custom tags can be added using
+			#   Writer.register_tag() function
+			# kwargs (optional args) ignored if not an .ply image:
+			#   - 'filter_points' default is True.
+			#       Filters NaN points (A = B = C = -32,678)
+			#   - 'is_signed' default is False.
+			#       If pixel format is signed for example
+			#       PixelFormat.Coord3D_A16s then this arg must be passed to
+			#       the save function else the results would not be correct
+			#   - 'scale' default is 0.25.
+			#   - 'offset_a', 'offset_b' and 'offset_c' default to 0.0
+			ply_future = save_executor.submit(renderer.writer_ply.save,
+											  buffer_3d, 'heatmap.ply',
+											  color=renderer.ptr_array_RGB8,
+											  filter_points=True)
+			save_futures.append(ply_future)
+
+		# wait for the files before requeuing buffer_3d and before the
+		# renderer arrays could be rewritten. result() raises any error of
+		# the save
+		for save_future in save_futures:
+			save_future.result()
 
 		# Requeue the chunk data buffers
 		device.requeue_buffer(buffer_3d)
@@ -424,6 +546,12 @@ def example_entry_point():
 	# is called automatically
 	print(f'{TAB1}Stream stopped')
 
+	save_executor.shutdown()
+
+	# the heat buffer is kept by the renderer for all frames and destroyed
+	# once nothing is saved anymore
+	renderer.destroy_heat_buffer()
+
 	# Clean up ----------------------------------------------------------------
 
 	# restores initial node values
@@ -442,5 +570,6 @@ if __name__ == '__main__':
 	print('THIS EXAMPLE IS DESIGNED FOR HELIOUS 3D CAMERAS WITH LATEST '
 		'FIRMWARE ONLY!')
 	print('\nExample started\n')
-	example_entry_point()
+	# pass --gpu to color the heat map on a cuda gpu (requires cupy)
+	example_entry_point(use_gpu='--gpu' in sys.argv[1:])
 	print('\nExample finished successfully')
@@ -13,6 +13,11 @@
 # -----------------------------------------------------------------------------
 
 
+import ctypes
+import os
+import queue
+import sys
+import threading
 import time
 
 from arena_api.__future__.save import Recorder
@@ -30,6 +35,37 @@ Save Recorder: Introduction
 TAB1 = "  "
 TAB2 = "    "
 
+"""
+number of received buffers that can wait for the recorder before the
+grabbing thread blocks
+"""
+BUFFER_QUEUE_SIZE = 8
+
+"""
+longest time, in seconds, the recorder is expected to stall while encoding.
+The stream gets enough buffers to keep acquiring frames during such a stall
+"""
+MAX_ENCODER_STALL_SECS = 2
+MIN_NUMBER_OF_BUFFERS = 100
+
+"""
+cpu cores the grabbing and encoding threads are pinned to, and the
+SCHED_FIFO priority (1-99) of the grabbing thread. Pinning and real-time
+scheduling keep OS scheduling jitter from delaying the grabber at high frame
+rates. They need Linux, and the priority needs CAP_SYS_NICE (root), so the
+threads keep the default scheduling when not permitted
+"""
+GRABBER_CPU = 2
+ENCODER_CPU = 3
+GRABBER_REALTIME_PRIORITY = 50
+
+"""
+lock all pages of the process in memory so no page fault happens while
+recording. Needs a large enough memlock limit (ulimit -l) or CAP_IPC_LOCK
+"""
+LOCK_MEMORY = False
+
+
 def create_devices_with_tries():
 	
 	'''
@@ -45,10 +81,7 @@ def create_devices_with_tries():
 			print(
 				f'{TAB1}Try {tries+1} of {tries_max}: waiting for {sleep_time_secs} '
 				f'secs for a device to be connected!')
-			for sec_count in range(sleep_time_secs):
-				time.sleep(1)
-				print(f'{TAB1}{sec_count + 1 } seconds passed ',
-					'.' * sec_count, end='\r')
+			time.sleep(sleep_time_secs)
 			tries += 1
 		else:
 			print(f'{TAB1}Created {len(devices)} device(s)')
@@ -59,6 +92,108 @@ def create_devices_with_tries():
 		return
 
 
+def pin_current_thread(cpu, realtime_priority=None):
+	"""
+	pins the calling thread to one cpu core and, if realtime_priority is
+	given, schedules it with SCHED_FIFO at that priority. Failures are
+	printed and the thread keeps running with the default scheduling
+	"""
+	try:
+		os.sched_setaffinity(0, {cpu})
+	except (AttributeError, OSError) as error:
+		print(f'{TAB2}Could not pin thread to cpu {cpu}: {error}')
+
+	if realtime_priority is None:
+		return
+	try:
+		os.sched_setscheduler(0, os.SCHED_FIFO,
+							  os.sched_param(realtime_priority))
+	except (AttributeError, OSError) as error:
+		print(f'{TAB2}Could not set real-time priority: {error}')
+
+
+def lock_process_memory():
+	"""
+	locks current and future pages of the process in memory with mlockall()
+	"""
+	MCL_CURRENT = 1
+	MCL_FUTURE = 2
+
+	if not sys.platform.startswith('linux'):
+		print(f'{TAB1}Memory locking is only supported on Linux')
+		return
+	libc = ctypes.CDLL(None, use_errno=True)
+	if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+		print(f'{TAB1}Could not lock memory: '
+			  f'{os.strerror(ctypes.get_errno())}')
+
+
+def grab_buffers(device, buffer_queue, total_images, errors):
+	"""
+	gets buffers from the device and hands them to the recorder thread.
+	Grabbing runs on its own thread so the stream keeps being drained
+	while the recorder is encoding. Stops early once either thread added
+	an error to errors, and always ends the queue with None so the
+	recorder thread finishes too
+	"""
+	try:
+		pin_current_thread(GRABBER_CPU, GRABBER_REALTIME_PRIORITY)
+
+		for count in range(total_images):
+			if errors:
+				break
+			buffer = device.get_buffer()
+			print(f'{TAB1}Image buffer {count} received')
+
+			"""
+			put() blocks once BUFFER_QUEUE_SIZE buffers are waiting, which
+			keeps at most that many buffers away from the stream
+			"""
+			buffer_queue.put(buffer)
+	except Exception as error:
+		errors.append(error)
+	finally:
+		buffer_queue.put(None)
+
+
+def append_buffers(device, recorder, buffer_queue, errors):
+	"""
+	appends the buffers received by grab_buffers() to the recorder in the
+	order they were acquired, then requeues them. After an error the
+	remaining buffers are only requeued, until grab_buffers() sends None
+	"""
+	pin_current_thread(ENCODER_CPU)
+
+	for count, buffer in enumerate(iter(buffer_queue.get, None)):
+		try:
+			if not errors:
+				"""
+				After recorder.open() add image to the open recorder stream
+					by appending buffers to the video.
+				The buffers are already BGR8, because we set 'PixelFormat'
+					node to 'BGR8', so no need to convert buffers using
+					BufferFactory.convert() from arena_api.buffer
+				"""
+
+				"""
+				default name for the video is 'video<count>.mp4' where count
+				is a pre-defined tag that gets updated every time open()
+				is called. More custom tags can be added using
+				Recorder.register_tag() function
+				"""
+				recorder.append(buffer)
+				print(f'{TAB1}Image buffer {count} appended to video')
+		except Exception as error:
+			errors.append(error)
+
+		# requeue even after an error, the buffer belongs to the stream
+		try:
+			device.requeue_buffer(buffer)
+			print(f'{TAB1}Image buffer requeued')
+		except Exception as error:
+			errors.append(error)
+
+
 def example_entry_point():
 	"""
 	demonstrates Save Recorder
@@ -66,8 +201,8 @@ def example_entry_point():
 	 (2) Configure device nodes
 	 (3) Create a recorder object and configure its width, height,
 	 	and acquisition frame rate
-	 (4) Open recorder, start stream and get buffers
-	 (5) Append buffers to the recorder
+	 (4) Open recorder, start stream and get buffers on a grabbing thread
+	 (5) Append buffers to the recorder on an encoding thread
 	 (6) Close the recorder to save the video
 	"""
 
@@ -81,6 +216,9 @@ def example_entry_point():
 	if not devices:
 		return
 
+	if LOCK_MEMORY:
+		lock_process_memory()
+
 	device = system.select_device(devices)
 	nodemap = device.nodemap
 	tl_stream_nodemap = device.tl_stream_nodemap
@@ -91,6 +229,14 @@ def example_entry_point():
 	# Enable stream packet resend
 	tl_stream_nodemap['StreamPacketResendEnable'].value = True
 
+	"""
+	Set buffer handling mode to 'OldestFirst'
+		A video must not skip or reorder frames, so buffers are delivered
+		in the order they were filled. While the recorder stalls, frames wait
+		in the stream buffers instead of being overwritten by newer ones
+	"""
+	tl_stream_nodemap['StreamBufferHandlingMode'].value = 'OldestFirst'
+
 	# Set node values ---------------------------------------------------------
 
 	"""
@@ -110,10 +256,32 @@ def example_entry_point():
 	"""
 	nodemap['PixelFormat'].value = PixelFormat.BGR8
 
+	"""
+	the recorder codec is set to 'bgr8' below. Any other pixel format from
+	the device would have to be converted with BufferFactory.convert(), a
+	full copy of every frame on the CPU, so a device that did not accept
+	BGR8 is reported instead of silently paying for that conversion
+	"""
+	if nodemap['PixelFormat'].value != PixelFormat.BGR8.name:
+		raise Exception(f'{TAB1}PixelFormat is '
+						f'{nodemap["PixelFormat"].value} and not '
+						f'{PixelFormat.BGR8.name}, every frame would need a '
+						f'CPU conversion before recording')
+
 	# start stream ------------------------------------------------------------
 
-	with device.start_stream(100):
-		print(f'{TAB1}Stream started')
+	"""
+	with 'OldestFirst' frames are only lost when every buffer is full, so
+	allocate enough buffers to cover the worst encoder stall
+	"""
+	number_of_buffers = max(MIN_NUMBER_OF_BUFFERS,
+							int(nodemap['AcquisitionFrameRate'].value *
+								MAX_ENCODER_STALL_SECS))
+
+	with device.start_stream(number_of_buffers):
+		print(f'{TAB1}Stream started with {number_of_buffers} buffers')
+		print(f"{TAB2}packet size "
+			  f"{nodemap['DeviceStreamChannelPacketSize'].value} bytes")
 
 		"""
 		create a recorder
@@ -136,32 +304,30 @@ def example_entry_point():
 		print(f'{TAB1}Recorder opened')
 
 		TOTAL_IMAGES = 100
-		for count in range(TOTAL_IMAGES):
-			buffer = device.get_buffer()
-			print(f'{TAB1}Image buffer received')
 
-			"""
-			After recorder.open() add image to the open recorder stream by
-				appending buffers to the video.
-			The buffers are already BGR8, because we set 'PixelFormat'
-				node to 'BGR8', so no need to convert buffers using
-				BufferFactory.convert() from arena_api.buffer
-			"""
-
-			"""
-			default name for the video is 'video<count>.mp4' where count
-			is a pre-defined tag that gets updated every time open()
-			is called. More custom tags can be added using
-			Recorder.register_tag() function
-			"""
-			recorder.append(buffer)
-			print(f'{TAB1}Image buffer {count} appended to video')
-
-			device.requeue_buffer(buffer)
-			print(f'{TAB1}Image buffer requeued')
+		"""
+		grab and append on separate threads connected by a bounded queue,
+		so encoding a frame does not stall acquisition of the next one
+		"""
+		buffer_queue = queue.Queue(maxsize=BUFFER_QUEUE_SIZE)
+		errors = []
+		grabber = threading.Thread(target=grab_buffers,
+								   args=(device, buffer_queue, TOTAL_IMAGES,
+										 errors))
+		encoder = threading.Thread(target=append_buffers,
+								   args=(device, recorder, buffer_queue,
+										 errors))
+		grabber.start()
+		encoder.start()
+		grabber.join()
+		encoder.join()
 
 		recorder.close()
 		print(f'{TAB1}Recorder closed')
+
+		# raise the first error of the threads instead of reporting a video
+		if errors:
+			raise errors[0]
 		print(f'{TAB1}Video saved {recorder.saved_videos[-1]}')
 
 		video_length_in_secs = (TOTAL_IMAGES /
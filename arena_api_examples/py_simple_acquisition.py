@@ -43,10 +43,7 @@ def update_create_devices():
 			print(
 				f'{TAB1}Try {tries+1} of {tries_max}: waiting for {sleep_time_secs} '
 				f'secs for a device to be connected!')
-			for sec_count in range(sleep_time_secs):
-				time.sleep(1)
-				print(f'{TAB1}{sec_count + 1 } seconds passed ',
-					'.' * sec_count, end='\r')
+			time.sleep(sleep_time_secs)
 			tries += 1
 		else:
 			return devices
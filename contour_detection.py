@@ -1,22 +1,118 @@
 import cv2
 import numpy as np
-from PIL import Image
 
-image = Image.open("circle_alignment_reference_2.jpg")
-known_min = 1
-known_max = 2
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional, analyze_circles() then runs as plain numpy
+    njit = None
 
-gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-gray = cv2.GaussianBlur(gray, (9, 9), 2)    # filter noise of image background
+# decode straight to grayscale: PIL images are RGB and not numpy arrays, so
+# cv2.cvtColor(..., COLOR_BGR2GRAY) could not use them
+gray = cv2.imread("circle_alignment_reference_2.jpg", cv2.IMREAD_GRAYSCALE)
+known_min = 5     # circle radius range, in pixels
+known_max = 20
+min_circularity = 0.8   # 4*pi*area/perimeter^2, 1 for a perfect circle
+max_pyramid_levels = 2  # HoughCircles runs on an image downscaled up to 2**levels
+min_hough_radius = 3    # smallest radius, in pixels, still found on the downscaled image
+hough_votes = 30        # HoughCircles accumulator threshold at full resolution
 
-circles = cv2.HoughCircles(gray, cv2.HOUGH_GRADIENT, dp=1.2, minDist=50,
-                           param1=50, param2=30, minRadius=known_min, maxRadius=known_max)  # radius units in pixels
 
-if circles is not None:
-    circles = np.round(circles[0, :]).astype("int")
-    circles = sorted(circles, key=lambda c: c[0])  # sort by x
+def find_circles_from_contours(gray):
+    # Fit a circle to every closed edge: O(edges) instead of the O(pixels * radii)
+    # accumulator of HoughCircles. Returns an (N, 3) array of x, y, radius
+    edges = cv2.Canny(gray, 50, 150)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
 
-    left, center, right = circles[:3]
-    distance = np.linalg.norm(left[:2] - right[:2])
+    found = []
+    for contour in contours:
+        (x, y), r = cv2.minEnclosingCircle(contour)
+        perimeter = cv2.arcLength(contour, True)
+        if not known_min <= r <= known_max or perimeter == 0:
+            continue
+        circularity = 4 * np.pi * cv2.contourArea(contour) / perimeter ** 2
+        if circularity > min_circularity:
+            found.append((x, y, r))
+    return np.array(found, dtype=np.float32).reshape(-1, 3)
+
+
+def find_circles_with_hough(gray):
+    # The Hough accumulator costs pixels * radii, so search a pyrDown'ed copy
+    # (up to 16x fewer pixels and 4x fewer radii at 2 levels) as long as the
+    # smallest circle stays detectable, then refine each circle at full
+    # resolution in a small window around it. Returns an (N, 3) array.
+    # With known_min = 5 no level is used (a 2x smaller circle would be under
+    # min_hough_radius), so the pyramid only runs for larger circles
+    levels = 0
+    while levels < max_pyramid_levels and known_min >> (levels + 1) >= min_hough_radius:
+        levels += 1
+    scale = 2 ** levels
+
+    small = gray
+    for _ in range(levels):
+        small = cv2.pyrDown(small)
+
+    # a circle gets votes along its circumference, which shrinks with the
+    # scale, so the coarse threshold shrinks too. The refinement below checks
+    # every candidate against the full hough_votes
+    circles = cv2.HoughCircles(small, cv2.HOUGH_GRADIENT, dp=1.2, minDist=max(1, 50 // scale),
+                               param1=50, param2=max(1, hough_votes // scale),
+                               minRadius=known_min // scale,
+                               maxRadius=max(1, known_max // scale))  # radius units in pixels
+    if circles is None:
+        return np.empty((0, 3), dtype=np.float32)
+    circles = circles[0, :] * scale
+    if scale == 1:
+        return circles
+
+    confirmed = []
+    for circle in circles:
+        x, y, r = circle
+        half = int(r + 2 * scale)
+        x0, y0 = max(0, int(x) - half), max(0, int(y) - half)
+        window = gray[y0:int(y) + half + 1, x0:int(x) + half + 1]
+        refined = cv2.HoughCircles(window, cv2.HOUGH_GRADIENT, dp=1, minDist=window.shape[0],
+                                   param1=50, param2=hough_votes, minRadius=max(1, int(r) - scale),
+                                   maxRadius=int(r) + scale)
+        if refined is not None:
+            confirmed.append(refined[0, 0] + (x0, y0, 0))
+    return np.array(confirmed, dtype=np.float32).reshape(-1, 3)
+
+
+def analyze_circles(circles):
+    # Sort an (N, 3) int32 array of circles by x and return the left, center
+    # and right circles (the first three) with the left to right distance.
+    # Compiled with numba when it is installed, so many circles stay cheap.
+    # numba does not bounds check, so the length is checked here
+    if circles.shape[0] < 3:
+        raise ValueError("analyze_circles needs at least 3 circles")
+    circles = circles[np.argsort(circles[:, 0], kind="mergesort")]  # sort by x
+    left, center, right = circles[0], circles[1], circles[2]
+    distance = np.hypot(right[0] - left[0], right[1] - left[1])
+    return left, center, right, distance
+
+
+if njit is not None:
+    analyze_circles = njit(cache=True)(analyze_circles)
+
+
+# filter noise of image background. GaussianBlur is already applied as two 1D
+# passes, so the only speedup left is offloading it to an OpenCL device (an
+# otherwise idle iGPU) through a UMat when one is available
+if cv2.ocl.haveOpenCL():
+    cv2.ocl.setUseOpenCL(True)
+    gray = cv2.GaussianBlur(cv2.UMat(gray), (9, 9), 2).get()
+else:
+    gray = cv2.GaussianBlur(gray, (9, 9), 2)
+
+circles = find_circles_from_contours(gray)
+if len(circles) == 0:
+    # fall back to the Hough transform when no edge was round enough
+    circles = find_circles_with_hough(gray)
+
+if len(circles) < 3:
+    print(f"Found {len(circles)} circles, the alignment needs 3")
+else:
+    left, center, right, distance = analyze_circles(np.round(circles).astype(np.int32))
     print(f"Centers: Left={left[:2]}, Center={center[:2]}, Right={right[:2]}")
     print(f"Distance between left and right: {distance}")
\ No newline at end of file
@@ -1,9 +1,36 @@
+import ctypes
+import os
+import queue
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from arena_api.system import system
 import numpy as np
 
 TAB1 = "  "
 
+NUMBER_OF_IMAGES = 1
+PNG_COMPRESSION = 1
+
+# PNG encoding runs on one thread per core while frames keep being acquired.
+# At most MAX_PENDING_ENCODES frames wait for encoding before acquisition
+# waits for the oldest one to be written
+ENCODE_THREADS = os.cpu_count() or 1
+MAX_PENDING_ENCODES = 2 * ENCODE_THREADS
+
+# Encoded PNGs are written to disk by a single writer thread, so neither
+# acquisition nor encoding waits for the disk until WRITE_QUEUE_SIZE encoded
+# images are queued
+WRITE_QUEUE_SIZE = 16
+
+# Also store the raw frames, losslessly compressed, in RAW_ARCHIVE_PATH
+# (requires h5py and hdf5plugin). PNG is still written for previews. Frames
+# are archived ARCHIVE_BATCH_SIZE at a time
+SAVE_RAW_ARCHIVE = False
+RAW_ARCHIVE_PATH = "frames.h5"
+ARCHIVE_BATCH_SIZE = 16
+
 def update_create_devices():
 	'''
 	Waits for the user to connect a device before raising an
@@ -18,10 +45,7 @@ def update_create_devices():
 			print(
 				f'{TAB1}Try {tries+1} of {tries_max}: waiting for {sleep_time_secs} '
 				f'secs for a device to be connected!')
-			for sec_count in range(sleep_time_secs):
-				time.sleep(1)
-				print(f'{TAB1}{sec_count + 1 } seconds passed ',
-					'.' * sec_count, end='\r')
+			time.sleep(sleep_time_secs)
 			tries += 1
 		else:
 			return devices
@@ -29,29 +53,136 @@ def update_create_devices():
 		raise Exception(f'{TAB1}No device found! Please connect a device and run '
 						f'the example again.')
 
+def archive_frames(images):
+	'''
+	Appends a (count, height, width) batch of raw frames to the "frames"
+		dataset of the HDF5 archive, one chunk per frame compressed with byte
+		shuffle and LZ4. This writes many times faster than PNG encoding, and
+		the file is opened and the dataset grown once per batch instead of
+		once per frame. Shuffle only helps frames with more than 8 bits per
+		pixel
+	'''
+	import h5py
+	import hdf5plugin
+
+	frame_shape = images.shape[1:]
+	with h5py.File(RAW_ARCHIVE_PATH, "a") as archive:
+		if "frames" not in archive:
+			archive.create_dataset("frames", shape=(0,) + frame_shape,
+								   maxshape=(None,) + frame_shape,
+								   dtype=images.dtype,
+								   chunks=(1,) + frame_shape, shuffle=True,
+								   **hdf5plugin.LZ4())
+		dataset = archive["frames"]
+		start = len(dataset)
+		dataset.resize(start + len(images), axis=0)
+		dataset[start:] = images
+
+def save_image(image_path, image, write_queue):
+	'''
+	Encodes one frame as PNG and queues it for the writer thread. Runs on the
+		encode thread pool, cv2.imencode() releases the GIL so the threads
+		encode in parallel
+	'''
+	ok, encoded = cv2.imencode(".png", image, [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION])
+	if not ok:
+		raise Exception(f"{TAB1}Could not encode {image_path} as PNG")
+	write_queue.put((image_path, encoded))
+
+def write_images(write_queue, write_errors):
+	'''
+	Writes the (path, encoded PNG) items of write_queue to disk until it
+		gets None. A failed write is added to write_errors and the queue
+		keeps being drained, so the encode threads never block on it
+	'''
+	for image_path, encoded in iter(write_queue.get, None):
+		if write_errors:
+			continue
+		try:
+			with open(image_path, "wb") as image_file:
+				image_file.write(encoded)
+			print(f"{TAB1}Image saved as {image_path}")
+		except Exception as error:
+			write_errors.append(error)
+
+
 devices = update_create_devices()
 device = system.select_device(devices)
 
 import numpy as np
 import cv2
 
-with device.start_stream():
-    buffer = device.get_buffer()
-    print(f"{TAB1}Acquire Image")
+write_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+write_errors = []
+writer = threading.Thread(target=write_images, args=(write_queue, write_errors), daemon=True)
+writer.start()
+
+with device.start_stream(), \
+        ThreadPoolExecutor(max_workers=ENCODE_THREADS) as encode_pool:
+    pending_encodes = deque()
+    # Frames are copied into a ring of arrays allocated with the first
+    # buffer. A slot is reused once the encode of the frame it held is done
+    frames = None
+    archive_batch = None
+    archived = 0
+
+    for count in range(NUMBER_OF_IMAGES):
+        buffer = device.get_buffer()
+        print(f"{TAB1}Acquire Image")
+
+        width = buffer.width
+        height = buffer.height
+        pixel_format = buffer.pixel_format
+
+        # View the buffer memory as a numpy array without copying it. The
+        # view points into the device buffer, so it is only used before the
+        # buffer is requeued
+        image_data = (ctypes.c_ubyte * (width * height)).from_address(
+            ctypes.addressof(buffer.pdata.contents))
+        image = np.frombuffer(image_data, dtype=np.uint8).reshape((height, width))
+
+        if frames is None:
+            frames = np.empty((MAX_PENDING_ENCODES, height, width), dtype=np.uint8)
+            if SAVE_RAW_ARCHIVE:
+                archive_batch = np.empty((ARCHIVE_BATCH_SIZE, height, width), dtype=np.uint8)
+
+        # Wait for the oldest encode when too many frames are pending, this
+        # also frees the slot of this frame
+        if len(pending_encodes) >= MAX_PENDING_ENCODES:
+            pending_encodes.popleft().result()
+
+        # Copy the frame once so the buffer can be requeued right away and
+        # the device keeps acquiring while the copy is encoded
+        frame = frames[count % MAX_PENDING_ENCODES]
+        np.copyto(frame, image)
+        device.requeue_buffer(buffer)
+
+        if NUMBER_OF_IMAGES == 1:
+            image_path = "acquired_image.png"
+        else:
+            image_path = f"acquired_image_{count}.png"
 
-    data = buffer.data
-    width = buffer.width
-    height = buffer.height
-    pixel_format = buffer.pixel_format
+        pending_encodes.append(encode_pool.submit(save_image, image_path, frame, write_queue))
 
-    # Convert list to bytes
-    byte_data = bytes(data)
+        if SAVE_RAW_ARCHIVE:
+            np.copyto(archive_batch[archived], frame)
+            archived += 1
+            if archived == ARCHIVE_BATCH_SIZE:
+                archive_frames(archive_batch)
+                print(f"{TAB1}{archived} images archived in {RAW_ARCHIVE_PATH}")
+                archived = 0
 
-    # Convert to numpy array and reshape
-    image = np.frombuffer(byte_data, dtype=np.uint8).reshape((height, width))
+    # Archive the last, partial, batch
+    if archived:
+        archive_frames(archive_batch[:archived])
+        print(f"{TAB1}{archived} images archived in {RAW_ARCHIVE_PATH}")
 
-    cv2.imwrite("acquired_image.png", image)
-    print(f"{TAB1}Image saved as acquired_image.png")
+    # result() raises any error of the encode
+    for encode in pending_encodes:
+        encode.result()
 
-    # Requeue buffer
-    device.requeue_buffer(buffer)
\ No newline at end of file
+# Let the writer finish the queued images
+write_queue.put(None)
+writer.join()
+if write_errors:
+    raise write_errors[0]